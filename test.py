@@ -1,17 +1,34 @@
 import os
+import sys
+import re
+import logging
 import uuid
 import struct
 import base64
-import base58
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import csv
 import datetime
 import time
-import random
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
 from solders.keypair import Keypair
 from dotenv import load_dotenv
 
+try:
+    import orjson as _json  # быстрый C парсер, если установлен
+except ImportError:
+    import json as _json
+
+try:
+    from based58 import b58decode, b58encode  # Rust реализация, если установлена
+except ImportError:
+    from base58 import b58decode, b58encode
+
 """~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 Solayer claim / vesting checker (Python 3.11+)
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -34,20 +51,17 @@ varint‑length‑prefixed strings/bytes.
 # Добавим в начало файла после импортов:
 
 CONFIG = {
-    'delay_between_wallets': 2.0,  # Базовая задержка между кошельками в секундах
-    'delay_random_range': 1.0,     # Случайное добавление к задержке (±)
+    'concurrency': 4,              # Сколько кошельков обрабатываем параллельно
+    'requests_per_second': 2.0,    # Общий лимит HTTP запросов в секунду (0 — без лимита)
     'max_retries': 3,              # Максимальное количество попыток
-    'retry_delay_base': 5.0,       # Базовая задержка для ретрая
-    'retry_delay_multiplier': 2.0, # Множитель для экспоненциального backoff
+    'retry_backoff_factor': 0.5,   # Backoff между ретраями: factor * 2^(n-1) секунд
     'request_timeout': 30.0,       # Таймаут для HTTP запросов
 }
 
 def load_config(filename: str = 'config.json') -> dict:
     """Загружаем конфигурацию из файла"""
     try:
-        import json
-        with open(filename, 'r') as f:
-            custom_config = json.load(f)
+        custom_config = _json.loads(Path(filename).read_bytes())
         CONFIG.update(custom_config)
         print(f"📋 Конфигурация загружена из {filename}")
     except FileNotFoundError:
@@ -56,61 +70,125 @@ def load_config(filename: str = 'config.json') -> dict:
         print(f"⚠️  Ошибка загрузки конфига: {e}, используем стандартную конфигурацию")
     return CONFIG
 
-def wait_between_requests():
-    """Задержка между запросами"""
-    base_delay = CONFIG['delay_between_wallets']
-    random_delay = random.uniform(-CONFIG['delay_random_range'], CONFIG['delay_random_range'])
-    total_delay = max(0.1, base_delay + random_delay)
-    
-    print(f"⏱️  Ожидание {total_delay:.1f}с перед следующим кошельком...")
-    time.sleep(total_delay)
+DEBUG = bool(os.getenv("SOLAYER_DEBUG"))  # начальный уровень логгера: подробный вывод парсинга
+
+log = logging.getLogger("solayer")
+log.setLevel(logging.DEBUG if DEBUG else logging.INFO)
+
+_FLOAT_RE = re.compile(r'\d+\.\d+')
+_BIGINT_RE = re.compile(r'\d{9,}')
+
+_pack_be_u32 = struct.Struct(">I").pack  # формат разобран один раз
+_LEN_PREFIX = [bytes([i]) for i in range(0x80)]  # готовые однобайтовые varint
+
+def _varint(n: int) -> bytes:
+    """Кодируем неотрицательное число как protobuf varint"""
+    if 0 <= n < 0x80:
+        return _LEN_PREFIX[n]
+    if n < 0:
+        raise ValueError(f"varint не поддерживает отрицательные числа: {n}")
+    out = bytearray()
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+class _RateLimitedRetry(Retry):
+    """Retry, который перед каждой повторной отправкой берет токен у rate_limiter"""
+
+    rate_limiter: Optional["RateLimiter"] = None
+
+    def new(self, **kw) -> "_RateLimitedRetry":
+        retry = super().new(**kw)  # urllib3 создает новый объект на каждую попытку
+        retry.rate_limiter = self.rate_limiter
+        return retry
+
+    def sleep(self, response=None) -> None:
+        super().sleep(response)
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+def _make_adapter(pool_maxsize: int = 64, rate_limiter: Optional["RateLimiter"] = None) -> HTTPAdapter:
+    """Пул keep-alive соединений к claim.solayer.foundation с ретраями на уровне urllib3"""
+    retry = _RateLimitedRetry(
+        total=CONFIG['max_retries'],
+        backoff_factor=CONFIG['retry_backoff_factor'],
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=["POST"],  # все вызовы API — POST
+        respect_retry_after_header=True,
+    )
+    retry.rate_limiter = rate_limiter  # ретраи тоже входят в общий лимит запросов
+    return HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
 
+# Один browser-id на весь запуск, как у одной вкладки браузера
+_BROWSER_ID = base64.b64encode(os.urandom(16)).decode()
 
-def retry_on_error(func, *args, **kwargs):
-    """Выполняет функцию с ретраями при ошибках"""
-    last_exception = None
-    
-    for attempt in range(CONFIG['max_retries'] + 1):
-        try:
-            return func(*args, **kwargs)
-        except requests.exceptions.RequestException as e:
-            last_exception = e
-            if attempt < CONFIG['max_retries']:
-                delay = CONFIG['retry_delay_base'] * (CONFIG['retry_delay_multiplier'] ** attempt)
-                print(f"⚠️  Ошибка сети (попытка {attempt + 1}/{CONFIG['max_retries'] + 1}): {e}")
-                print(f"⏱️  Ретрай через {delay:.1f}с...")
-                time.sleep(delay)
-            else:
-                print(f"❌ Превышено максимальное количество попыток")
-                raise last_exception
-        except Exception as e:
-            # Для других ошибок не делаем ретрай
-            print(f"❌ Критическая ошибка: {e}")
-            raise e
-    
-    raise last_exception
+# Одна сессия на все кошельки: TCP/TLS соединения переиспользуются между запросами
+_SESSION = requests.Session()
+_SESSION.mount("https://", _make_adapter())
 
+class RateLimiter:
+    """Token bucket: не больше `rate` запросов в секунду на все потоки"""
 
-def process_wallet(private_key_b58: str) -> dict:
-    """Обрабатываем один кошелек и возвращаем результат"""
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate
+        self._tokens = threading.BoundedSemaphore(max(1, int(rate)))
+        self._stopped = threading.Event()
+        self._refiller = threading.Thread(target=self._refill, daemon=True)
+        self._refiller.start()
+
+    def _refill(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self._tokens.release()
+            except ValueError:
+                pass  # ведро уже полное
+
+    def acquire(self) -> None:
+        while not self._tokens.acquire(timeout=self.interval):
+            if self._stopped.is_set():
+                return  # лимитер остановлен — не держим оставшиеся потоки
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+_STDOUT_LOCK = threading.Lock()
+
+def _emit(lines: list[str]) -> None:
+    """Выводим блок строк одним write, не перемешивая его с выводом других потоков"""
+    with _STDOUT_LOCK:
+        sys.stdout.write("\n".join(lines) + "\n")
+
+
+def process_wallet(
+    private_key_b58: str,
+    kp: Optional[Keypair] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    out: Optional[list[str]] = None,
+) -> dict:
+    """Обрабатываем один кошелек; строки статуса копим в `out` или выводим одним блоком"""
+    lines = [] if out is None else out
     try:
-        kp = Keypair.from_bytes(base58.b58decode(private_key_b58))
-        client = SolayerGRPCClient(kp)
+        if kp is None:
+            kp = Keypair.from_bytes(b58decode(private_key_b58.encode()))
+        client = SolayerGRPCClient(kp, rate_limiter=rate_limiter)
         
         wallet_address = str(kp.pubkey())
-        print(f"\n🔑 Обрабатываем кошелек: {wallet_address}")
+        lines.append(f"🔑 Кошелек: {wallet_address}")
         
-        # 1) Получаем challenge с ретраями
-        challenge = retry_on_error(client.get_signature_message)
+        # 1) Получаем challenge
+        challenge = client.get_signature_message()
         full_msg = challenge["field_1"]
         
-        # 2) Подписываем и верифицируем с ретраями
+        # 2) Подписываем и верифицируем
         nonce = str(uuid.uuid4())
-        signature = client.sign_message(full_msg)
-        retry_on_error(client.verify_signature, full_msg, signature, nonce)
+        sig_raw = client.sign_message_bytes(full_msg)  # без лишнего base58 туда-обратно
+        client.verify_signature_raw(full_msg, sig_raw, nonce)
         
-        # 3) Проверяем eligibility с ретраями
-        acc_info = retry_on_error(client.get_account_info)
+        # 3) Проверяем eligibility
+        acc_info = client.get_account_info()
         eligible = "field_1" in acc_info and len(acc_info["field_1"]) > 10
         
         # 4) Получаем vesting info если eligible
@@ -119,14 +197,14 @@ def process_wallet(private_key_b58: str) -> dict:
         
         if eligible:
             try:
-                v_claim = retry_on_error(client.get_vesting_claim_info)
-                vesting_data = parse_vesting_claim_data(v_claim.get("field_1", ""))
+                v_claim = client.get_vesting_claim_info()
+                vesting_data = parse_vesting_claim_data(v_claim.get("field_1", ""), out=lines)
                 
                 if vesting_data:
                     total_allocation = vesting_data["total_allocation"]
                     vested_amount = vesting_data["vested_amount"]
             except Exception as e:
-                print(f"⚠️  Ошибка получения vesting info: {e}")
+                lines.append(f"⚠️  Ошибка получения vesting info: {e}")
         
         result = {
             'private_key': private_key_b58,
@@ -141,13 +219,13 @@ def process_wallet(private_key_b58: str) -> dict:
         # Выводим результат
         status = "✅ ELIGIBLE" if eligible else "❌ NOT ELIGIBLE"
         allocation_text = result['total_allocation_formatted'] if eligible and total_allocation != "0" else "0.000"
-        print(f"   Статус: {status}")
-        print(f"   Allocation: {allocation_text} LAYER")
+        lines.append(f"   Статус: {status}")
+        lines.append(f"   Allocation: {allocation_text} LAYER")
         
         return result
         
     except Exception as e:
-        print(f"❌ Ошибка обработки кошелька {private_key_b58[:10]}...: {e}")
+        lines.append(f"❌ Ошибка обработки кошелька {private_key_b58[:10]}...: {e}")
         return {
             'private_key': private_key_b58,
             'wallet_address': 'ERROR',
@@ -157,32 +235,52 @@ def process_wallet(private_key_b58: str) -> dict:
             'total_allocation_formatted': '0.000',
             'status': f'ERROR: {str(e)}'
         }
+    finally:
+        if out is None:
+            _emit(lines)
 
-def load_private_keys(filename: str = 'keys.txt') -> list:
-    """Загружаем приватные ключи из файла"""
+def _decode_keypair(private_key_b58: str) -> Optional[Keypair]:
+    """Декодируем base58 ключ в Keypair, None если ключ невалидный"""
     try:
-        with open(filename, 'r') as f:
-            keys = [line.strip() for line in f if line.strip()]
+        return Keypair.from_bytes(b58decode(private_key_b58.encode()))
+    except Exception:
+        return None  # process_wallet повторит декодирование и запишет ошибку в CSV
+
+def load_private_keys(filename: str = 'keys.txt') -> list[tuple[str, Optional[Keypair]]]:
+    """Загружаем приватные ключи из файла и сразу декодируем их в Keypair"""
+    try:
+        keys = Path(filename).read_text().split()  # пустые строки и пробелы отбрасываются сами
         print(f"📁 Загружено {len(keys)} приватных ключей из {filename}")
-        return keys
+        return [(k, _decode_keypair(k)) for k in keys]
     except FileNotFoundError:
         print(f"❌ Файл {filename} не найден!")
         return []
 
-def save_to_csv(results: list, filename: str = None):
-    """Сохраняем результаты в CSV файл"""
+CSV_BUFFER_SIZE = 64 * 1024  # байт в буфере файла до записи на диск
+CSV_FLUSH_EVERY = 50         # сбрасываем буфер раз в столько строк
+
+@contextmanager
+def save_to_csv(filename: str = None) -> Iterator[Callable[[dict], None]]:
+    """Открываем CSV файл и отдаем функцию, дописывающую в него по одной строке"""
     if not filename:
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"solayer_results_{timestamp}.csv"
     
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+    with open(filename, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as csvfile:
         fieldnames = ['private_key', 'wallet_address', 'eligible', 'total_allocation', 
                      'vested_amount', 'total_allocation_formatted', 'status']
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        
         writer.writeheader()
-        for result in results:
+        rows = 0
+        
+        def write_row(result: dict) -> None:
+            nonlocal rows
             writer.writerow(result)
+            rows += 1
+            if rows % CSV_FLUSH_EVERY == 0:
+                csvfile.flush()  # при прерывании теряем не больше CSV_FLUSH_EVERY строк
+        
+        yield write_row
     
     print(f"💾 Результаты сохранены в {filename}")
 
@@ -194,7 +292,9 @@ def main_batch():
     # Загружаем конфигурацию
     config = load_config()
     print(f"⚙️  Настройки:")
-    print(f"   Задержка между кошельками: {config['delay_between_wallets']}±{config['delay_random_range']}с")
+    print(f"   Параллельных кошельков: {config['concurrency']}")
+    limit_text = f"{config['requests_per_second']}/с" if config['requests_per_second'] > 0 else "без лимита"
+    print(f"   Лимит запросов: {limit_text}")
     print(f"   Максимум попыток: {config['max_retries']}")
     print(f"   Таймаут запросов: {config['request_timeout']}с")
     
@@ -204,42 +304,59 @@ def main_batch():
         print("❌ Нет приватных ключей для обработки")
         return
     
-    results = []
+    eligible_wallets = []  # (адрес, allocation) — только для итоговой таблицы
     successful = 0
     eligible_count = 0
     total_allocation_sum = 0
-    start_time = time.time()
+    start_time = time.perf_counter()
+    rate_limiter = RateLimiter(config['requests_per_second']) if config['requests_per_second'] > 0 else None
+    # По keep-alive соединению на поток, сколько бы потоков ни было в config;
+    # адаптер пересоздаем и чтобы ретраи взяли max_retries/backoff из config.json
+    _SESSION.mount("https://", _make_adapter(pool_maxsize=config['concurrency'], rate_limiter=rate_limiter))
     
-    # Обрабатываем каждый кошелек
-    for i, private_key in enumerate(private_keys, 1):
-        print(f"\n{'='*60}")
-        print(f"📊 Обрабатываем кошелек {i}/{len(private_keys)}")
-        
-        wallet_start_time = time.time()
-        result = process_wallet(private_key)
-        wallet_end_time = time.time()
-        
-        results.append(result)
-        
-        if result['status'] == 'SUCCESS':
-            successful += 1
-            if result['eligible']:
-                eligible_count += 1
-                try:
-                    total_allocation_sum += float(result['total_allocation'])
-                except (ValueError, TypeError):
-                    pass
-        
-        # Показываем прогресс
-        elapsed = wallet_end_time - wallet_start_time
-        print(f"⏱️  Обработан за {elapsed:.1f}с")
-        
-        # Ждем перед следующим кошельком (кроме последнего)
-        if i < len(private_keys):
-            wait_between_requests()
+    def run(private_key: str, kp: Optional[Keypair]) -> tuple[dict, float, list[str]]:
+        lines = []
+        wallet_start_time = time.perf_counter()
+        result = process_wallet(private_key, kp, rate_limiter, out=lines)
+        wallet_end_time = time.perf_counter()
+        return result, wallet_end_time - wallet_start_time, lines
+    
+    # Обрабатываем кошельки параллельно, общий темп ограничивает rate_limiter.
+    # Результаты пишем в CSV сразу по мере готовности
+    try:
+        with save_to_csv() as write_row, ThreadPoolExecutor(max_workers=config['concurrency']) as ex:
+            futures = {ex.submit(run, k, kp): k for k, kp in private_keys}
+            try:
+                for i, future in enumerate(as_completed(futures), 1):
+                    result, elapsed, lines = future.result()
+                    write_row(result)
+                    
+                    if result['status'] == 'SUCCESS':
+                        successful += 1
+                        if result['eligible']:
+                            eligible_count += 1
+                            eligible_wallets.append((result['wallet_address'], result['total_allocation_formatted']))
+                            try:
+                                total_allocation_sum += float(result['total_allocation'])
+                            except (ValueError, TypeError):
+                                pass
+                    
+                    # Показываем прогресс и статус кошелька одним блоком
+                    _emit([
+                        f"\n{'='*60}",
+                        f"📊 Готово {i}/{len(private_keys)}, обработан за {elapsed:.1f}с",
+                        *lines,
+                    ])
+            except BaseException:
+                # Ctrl+C или ошибка: не отправляем запросы по оставшимся кошелькам
+                ex.shutdown(wait=False, cancel_futures=True)
+                raise
+    finally:
+        if rate_limiter:
+            rate_limiter.stop()
     
     # Выводим сводку
-    total_time = time.time() - start_time
+    total_time = time.perf_counter() - start_time
     print(f"\n{'='*60}")
     print("📈 ИТОГОВАЯ СВОДКА:")
     print(f"   Всего кошельков: {len(private_keys)}")
@@ -249,46 +366,14 @@ def main_batch():
     if total_allocation_sum > 0:
         print(f"   Общий allocation: {format_layer_amount(str(int(total_allocation_sum)))}")
     
-    # Сохраняем в CSV
-    save_to_csv(results)
-    
     # Показываем eligible кошельки
     if eligible_count > 0:
         print(f"\n🎉 ELIGIBLE КОШЕЛЬКИ:")
         print("-" * 100)
         print(f"{'Адрес':<45} {'Allocation':<20} {'Статус'}")
         print("-" * 100)
-        for result in results:
-            if result['eligible']:
-                addr = result['wallet_address']
-                allocation = result['total_allocation_formatted']
-                print(f"{addr:<45} {allocation:<20} ✅")
-
-def main():
-    """Основная функция - выбираем режим работы"""
-    # Проверяем, есть ли файл keys.txt
-    if os.path.exists('keys.txt'):
-        print("📁 Найден файл keys.txt")
-        choice = input("Выберите режим:\n1 - Один кошелек из .env\n2 - Batch обработка из keys.txt\nВвод (1/2): ").strip()
-        
-        if choice == '2':
-            main_batch()
-            return
-    
-    # Режим одного кошелька (оригинальный код)
-    pk_b58 = os.getenv("PRIVATE_KEY")
-    if not pk_b58:
-        raise SystemExit("PRIVATE_KEY not found in .env")
-    
-    result = process_wallet(pk_b58)
-    print(f"\n🎯 РЕЗУЛЬТАТ:")
-    print(f"   Кошелек: {result['wallet_address']}")
-    print(f"   Статус: {'✅ ELIGIBLE' if result['eligible'] else '❌ NOT ELIGIBLE'}")
-    if result['eligible']:
-        print(f"   Total Allocation: {result['total_allocation_formatted']}")
-    
-    # Сохраняем результат одного кошелька в CSV
-    save_to_csv([result])
+        for addr, allocation in eligible_wallets:
+            print(f"{addr:<45} {allocation:<20} ✅")
 
 def format_layer_amount(raw_amount: str | float) -> str:
     """Convert raw token amount to LAYER tokens (assuming 9 decimals like SOL)"""
@@ -300,10 +385,13 @@ def format_layer_amount(raw_amount: str | float) -> str:
     except (ValueError, TypeError):
         return f"{raw_amount} (raw)"
 
-def parse_vesting_claim_data(field_data: str | dict) -> dict:
-    """Более точный парсинг vesting данных"""
+def parse_vesting_claim_data(field_data: str | dict, out: Optional[list[str]] = None) -> dict:
+    """Более точный парсинг vesting данных; ошибки пишем в `out` или сразу выводим"""
+    lines = [] if out is None else out
+    debug = log.isEnabledFor(logging.DEBUG)  # проверяем уровень один раз, до форматирования
     try:
-        print(f"🔍 Парсим vesting данные: {field_data}")
+        if debug:
+            log.debug(f"🔍 Парсим vesting данные: {field_data}")
         
         # Если это словарь с nested полями
         if isinstance(field_data, dict):
@@ -311,7 +399,8 @@ def parse_vesting_claim_data(field_data: str | dict) -> dict:
             for key, value in field_data.items():
                 if isinstance(value, int) and value > 1000000:  # Большие числа
                     allocation_fields.append(value)
-                    print(f"   📊 Найдено большое число в {key}: {value}")
+                    if debug:
+                        log.debug(f"   📊 Найдено большое число в {key}: {value}")
             
             if allocation_fields:
                 return {
@@ -321,11 +410,10 @@ def parse_vesting_claim_data(field_data: str | dict) -> dict:
         
         # Если это строка, ищем числа
         if isinstance(field_data, str):
-            import re
-            
             # Ищем float числа (с точкой)
-            float_numbers = re.findall(r'\d+\.\d+', field_data)
-            print(f"   📊 Найденные float числа: {float_numbers}")
+            float_numbers = _FLOAT_RE.findall(field_data)
+            if debug:
+                log.debug(f"   📊 Найденные float числа: {float_numbers}")
             
             if float_numbers:
                 # Берем первое число (они одинаковые, но повторяются)
@@ -337,18 +425,20 @@ def parse_vesting_claim_data(field_data: str | dict) -> dict:
                     # Сохраняем как есть
                     amount_str = str(float_value)
                     
-                    print(f"   📊 Найденное число: {first_number} -> {amount_str}")
+                    if debug:
+                        log.debug(f"   📊 Найденное число: {first_number} -> {amount_str}")
                     
                     return {
                         'total_allocation': amount_str,
                         'vested_amount': amount_str
                     }
                 except ValueError:
-                    print(f"   ❌ Ошибка конвертации: {first_number}")
+                    lines.append(f"   ❌ Ошибка конвертации: {first_number}")
             
             # Fallback: ищем большие целые числа
-            numbers = re.findall(r'\d{9,}', field_data)
-            print(f"   📊 Найденные целые числа: {numbers}")
+            numbers = _BIGINT_RE.findall(field_data)
+            if debug:
+                log.debug(f"   📊 Найденные целые числа: {numbers}")
             
             if numbers:
                 return {
@@ -357,7 +447,10 @@ def parse_vesting_claim_data(field_data: str | dict) -> dict:
                 }
                 
     except Exception as e:
-        print(f"❌ Ошибка парсинга vesting данных: {e}")
+        lines.append(f"❌ Ошибка парсинга vesting данных: {e}")
+    finally:
+        if out is None and lines:
+            _emit(lines)
     
     return {}
 
@@ -369,13 +462,38 @@ class SolayerGRPCClient:
         "api/solayerservice.v1.SolayerService"
     )
 
-    def __init__(self, keypair: Keypair) -> None:
+    def __init__(
+        self,
+        keypair: Keypair,
+        session: Optional[requests.Session] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ) -> None:
         self.keypair = keypair
         self.wallet_address = str(keypair.pubkey())
-        self.browser_id = base64.b64encode(os.urandom(16)).decode()
+        self.browser_id = _BROWSER_ID
         self.token: str | None = None  # filled after VerifySignature
-        self.session = requests.Session()
-        self.session.timeout = CONFIG['request_timeout']
+        self.session = session or _SESSION  # shared keep‑alive pool by default
+        self.rate_limiter = rate_limiter
+        self._base_headers = {
+            "accept": "*/*",
+            "accept-language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
+            "browser-id": self.browser_id,
+            "connection": "keep-alive",
+            "content-type": "application/grpc-web+proto",
+            "origin": "https://claim.solayer.foundation",
+            "platform": "WEB",
+            "referer": "https://claim.solayer.foundation/",
+            "user-agent": (
+                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+                "AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/138.0.0.0 Safari/537.36"
+            ),
+            "x-grpc-web": "1",
+        }
+        # request bodies that depend only on the wallet are encoded once
+        self._login_msg = self._build_login_message()
+        self._login_req = self._grpc_wrap(self._login_msg)
+        self._simple_req = self._build_simple_request()
 
     # ------------------------------------------------------------------
     # gRPC‑Web helpers
@@ -383,138 +501,30 @@ class SolayerGRPCClient:
     @staticmethod
     def _grpc_wrap(payload: bytes) -> bytes:
         """Adds the 5‑byte gRPC‑Web prefix: 0x00 + big‑endian length."""
-        return b"\x00" + struct.pack(">I", len(payload)) + payload
+        return b"\x00" + _pack_be_u32(len(payload)) + payload
 
     @staticmethod
     def _build_simple_request(request_type: int = 1) -> bytes:
         """Message with only field1 = request_type (varint)."""
-        return SolayerGRPCClient._grpc_wrap(b"\x08" + bytes([request_type]))
+        return SolayerGRPCClient._grpc_wrap(b"\x08" + _varint(request_type))
 
-    def _build_login_request(self) -> bytes:
-        """field1=request_type=1, field2=wallet_address (string)."""
+    def _build_login_message(self) -> bytes:
+        """field1=request_type=1, field2=wallet_address (string), no gRPC prefix."""
         addr = self.wallet_address.encode()
-        msg = b"\x08\x01" + b"\x12" + bytes([len(addr)]) + addr
-        return self._grpc_wrap(msg)
+        return b"\x08\x01" + b"\x12" + _varint(len(addr)) + addr
 
     # ------------------------------------------------------------------
     # tiny protobuf parser (varint + length‑delimited)
     # ------------------------------------------------------------------
-    def _parse_protobuf_response(self, response_data):
-        """Парсим protobuf ответ с детальным логированием"""
-        try:
-            if len(response_data) < 5:
-                print(f"⚠️  Слишком короткий ответ: {len(response_data)} байт")
-                return None
-                
-            # Пропускаем gRPC заголовок (5 байт)
-            proto_data = response_data[5:]
-            print(f"🔍 Данные protobuf: {len(proto_data)} байт")
-            print(f"🔍 Hex данные: {proto_data.hex()}")
-            
-            if len(proto_data) == 0:
-                print("⚠️  Пустые данные protobuf")
-                return {}
-            
-            # Детальный парсинг protobuf
-            result = {}
-            i = 0
-            while i < len(proto_data):
-                if i >= len(proto_data):
-                    break
-                    
-                # Читаем field header
-                field_header = proto_data[i]
-                field_number = field_header >> 3
-                wire_type = field_header & 0x07
-                i += 1
-                
-                print(f"📋 Field {field_number}, wire_type {wire_type}")
-                
-                if wire_type == 0:  # varint
-                    value, i = self._read_varint(proto_data, i)
-                    result[f'field_{field_number}'] = value
-                    print(f"   📊 Varint value: {value}")
-                elif wire_type == 2:  # length-delimited (string/bytes)
-                    if i >= len(proto_data):
-                        break
-                    length, i = self._read_varint(proto_data, i)
-                    if i + length > len(proto_data):
-                        break
-                    value = proto_data[i:i+length]
-                    i += length
-                    
-                    print(f"   📊 Length: {length}, Raw bytes: {value.hex()}")
-                    
-                    try:
-                        # Пробуем декодировать как строку
-                        decoded = value.decode('utf-8')
-                        result[f'field_{field_number}'] = decoded
-                        print(f"   📊 String value: {decoded}")
-                    except:
-                        # Если не получается, сохраняем как base64
-                        b64 = base64.b64encode(value).decode('utf-8')
-                        result[f'field_{field_number}'] = b64
-                        print(f"   📊 Base64 value: {b64}")
-                        
-                        # Пробуем парсить как вложенный protobuf
-                        try:
-                            nested = self._parse_nested_protobuf(value)
-                            if nested:
-                                print(f"   🔍 Nested protobuf: {nested}")
-                                result[f'field_{field_number}_nested'] = nested
-                        except:
-                            pass
-                else:
-                    # Пропускаем неизвестные типы
-                    print(f"⚠️  Неизвестный wire_type: {wire_type}")
-                    i += 1
-                    
-            print(f"📋 Полный результат парсинга: {result}")
-            return result
-        except Exception as e:
-            print(f"❌ Ошибка парсинга protobuf: {e}")
-            return None
-
-    def _parse_nested_protobuf(self, data: bytes) -> dict:
-        """Парсим вложенные protobuf данные"""
-        result = {}
-        i = 0
-        while i < len(data):
-            try:
-                field_header = data[i]
-                field_number = field_header >> 3
-                wire_type = field_header & 0x07
-                i += 1
-                
-                if wire_type == 0:  # varint
-                    value, i = self._read_varint(data, i)
-                    result[f'nested_field_{field_number}'] = value
-                    print(f"      🔹 Nested varint {field_number}: {value}")
-                elif wire_type == 2:  # length-delimited
-                    length, i = self._read_varint(data, i)
-                    if i + length > len(data):
-                        break
-                    value = data[i:i+length]
-                    i += length
-                    try:
-                        decoded = value.decode('utf-8')
-                        result[f'nested_field_{field_number}'] = decoded
-                        print(f"      🔹 Nested string {field_number}: {decoded}")
-                    except:
-                        result[f'nested_field_{field_number}'] = value.hex()
-                        print(f"      🔹 Nested bytes {field_number}: {value.hex()}")
-                else:
-                    break
-            except:
-                break
-        return result
-
     @staticmethod
     def _read_varint(buf: bytes, i: int) -> tuple[int, int]:
         """Читаем varint из буфера"""
+        n = len(buf)
+        if i < n and buf[i] < 0x80:  # однобайтовый varint: теги, длины < 128, маленькие числа
+            return buf[i], i + 1
         shift = 0
         val = 0
-        while i < len(buf):
+        while i < n:
             b = buf[i]
             val |= (b & 0x7F) << shift
             i += 1
@@ -527,21 +537,21 @@ class SolayerGRPCClient:
     def _parse_message(cls, data: bytes) -> dict:
         if len(data) < 5:
             return {}
-        buf = data[5:]  # strip 5‑byte gRPC header
-        i, out = 0, {}
-        while i < len(buf):
-            key = buf[i]
+        buf = memoryview(data)[5:]  # strip 5‑byte gRPC header without copying
+        read_varint = cls._read_varint
+        i, out, n = 0, {}, len(buf)
+        while i < n:
+            key, i = read_varint(buf, i)
             field_no, wire = key >> 3, key & 0x07
-            i += 1
             if wire == 0:  # varint
-                val, i = cls._read_varint(buf, i)
+                val, i = read_varint(buf, i)
                 out[f"field_{field_no}"] = val
             elif wire == 2:  # length‑delimited
-                ln, i = cls._read_varint(buf, i)
+                ln, i = read_varint(buf, i)
                 val = buf[i : i + ln]
                 i += ln
                 try:
-                    out[f"field_{field_no}"] = val.decode()
+                    out[f"field_{field_no}"] = str(val, "utf-8")
                 except UnicodeDecodeError:
                     out[f"field_{field_no}"] = base64.b64encode(val).decode()
             else:
@@ -552,107 +562,85 @@ class SolayerGRPCClient:
     # HTTP headers
     # ------------------------------------------------------------------
     def _headers(self, use_auth: bool = False) -> dict:
-        h = {
-            "accept": "*/*",
-            "accept-language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
-            "browser-id": self.browser_id,
-            "content-type": "application/grpc-web+proto",
-            "origin": "https://claim.solayer.foundation",
-            "platform": "WEB",
-            "referer": "https://claim.solayer.foundation/",
-            "user-agent": (
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/138.0.0.0 Safari/537.36"
-            ),
-            "x-grpc-web": "1",
-            "x-request-id": str(uuid.uuid4()),
-        }
+        h = self._base_headers.copy()  # static part is built once in __init__
+        h["x-request-id"] = str(uuid.uuid4())
         if use_auth and self.token:
             h["authorization"] = self.token  # exactly as server gave, no Bearer
         return h
 
-    # ------------------------------------------------------------------
-    # API methods
-    # ------------------------------------------------------------------
-    def get_signature_message(self) -> dict:
+    def _post(self, method: str, data: bytes, use_auth: bool = False) -> requests.Response:
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
         resp = self.session.post(
-            f"{self.BASE_URL}/GetSignatureMessage",
-            headers=self._headers(),
-            data=self._build_login_request(),
+            f"{self.BASE_URL}/{method}",
+            headers=self._headers(use_auth),
+            data=data,
             timeout=CONFIG['request_timeout']
         )
         resp.raise_for_status()
+        return resp
+
+    # ------------------------------------------------------------------
+    # API methods
+    # ------------------------------------------------------------------
+    def get_signature_message(self) -> dict:
+        resp = self._post("GetSignatureMessage", self._login_req)
         return self._parse_message(resp.content)
 
     def verify_signature(self, message: str, signature_b58: str, nonce: str) -> dict:
-        sig_raw = base58.b58decode(signature_b58)
-        addr_bytes = self.wallet_address.encode()
+        return self.verify_signature_raw(message, b58decode(signature_b58.encode()), nonce)
+
+    def verify_signature_raw(self, message: str, sig_raw: bytes, nonce: str) -> dict:
+        """Same as verify_signature, but takes the 64‑byte signature as is."""
         nonce_bytes = nonce.encode()
         wallet_type = b"Phantom"
 
-        parts = [
-            b"\x08\x01",  # field1 request_type=1
-            b"\x12" + bytes([len(addr_bytes)]) + addr_bytes,  # field2 address
-            b"\x1a" + bytes([len(sig_raw)]) + sig_raw,  # field3 signature
-            b"\x22" + bytes([len(nonce_bytes)]) + nonce_bytes,  # field4 nonce
-            b"\x2a" + bytes([len(wallet_type)]) + wallet_type,  # field5 wallet_type
-        ]
-        payload = b"".join(parts)
-        resp = self.session.post(
-            f"{self.BASE_URL}/VerifySignature",
-            headers=self._headers(),
-            data=self._grpc_wrap(payload),
-            timeout=CONFIG['request_timeout']
-        )
-        resp.raise_for_status()
+        frame = bytearray(5)  # gRPC‑Web prefix, length is filled in below
+        frame += self._login_msg  # field1 request_type=1, field2 address
+        frame.append(0x1a)  # field3 signature, always 64 bytes
+        frame += _LEN_PREFIX[len(sig_raw)]
+        frame += sig_raw
+        frame.append(0x22)  # field4 nonce
+        frame += _varint(len(nonce_bytes))
+        frame += nonce_bytes
+        frame.append(0x2a)  # field5 wallet_type
+        frame += _LEN_PREFIX[len(wallet_type)]
+        frame += wallet_type
+        frame[1:5] = _pack_be_u32(len(frame) - 5)
+        resp = self._post("VerifySignature", bytes(frame))
         parsed = self._parse_message(resp.content)
         self.token = parsed.get("field_1")  # save JWT for later calls
         return parsed
 
     def get_account_info(self) -> dict:
-        resp = self.session.post(
-            f"{self.BASE_URL}/GetAccountInfo",
-            headers=self._headers(use_auth=True),
-            data=b"\x00\x00\x00\x00\x00",  # empty message
-            timeout=CONFIG['request_timeout']
-        )
-        resp.raise_for_status()
+        resp = self._post("GetAccountInfo", b"\x00\x00\x00\x00\x00", use_auth=True)  # empty message
         return self._parse_message(resp.content)
 
     # ---------- Vesting ----------
     def get_vesting_base_info(self) -> dict:
-        resp = self.session.post(
-            f"{self.BASE_URL}/GetVestingBaseInfo",
-            headers=self._headers(use_auth=True),
-            data=self._build_simple_request(),
-        )
-        resp.raise_for_status()
+        resp = self._post("GetVestingBaseInfo", self._simple_req, use_auth=True)
         return self._parse_message(resp.content)
 
     def get_vesting_claim_info(self) -> dict:
-        resp = self.session.post(
-            f"{self.BASE_URL}/GetVestingClaimInfo",
-            headers=self._headers(use_auth=True),
-            data=self._build_simple_request(),
-            timeout=CONFIG['request_timeout']
-        )
-        resp.raise_for_status()
+        resp = self._post("GetVestingClaimInfo", self._simple_req, use_auth=True)
         return self._parse_message(resp.content)
 
     # ------------------------------------------------------------------
     # Sign helper
     # ------------------------------------------------------------------
-    def sign_message(self, msg: str | bytes) -> str:
+    def sign_message_bytes(self, msg: str | bytes) -> bytes:
         msg_bytes = msg.encode() if isinstance(msg, str) else msg
-        sig = self.keypair.sign_message(msg_bytes)
-        return base58.b58encode(bytes(sig)).decode()
+        return bytes(self.keypair.sign_message(msg_bytes))
+
+    def sign_message(self, msg: str | bytes) -> str:
+        return b58encode(self.sign_message_bytes(msg)).decode()
 
 # ----------------------------------------------------------------------
 # ------------------------------  CLI  ---------------------------------
 # ----------------------------------------------------------------------
 def main():
     """Основная функция - выбираем режим работы"""
+    logging.basicConfig(format="%(message)s")
     # Проверяем, есть ли файл keys.txt
     if os.path.exists('keys.txt'):
         print("📁 Найден файл keys.txt")
@@ -675,7 +663,8 @@ def main():
         print(f"   Total Allocation: {result['total_allocation_formatted']}")
     
     # Сохраняем результат одного кошелька в CSV
-    save_to_csv([result])
+    with save_to_csv() as write_row:
+        write_row(result)
 
 if __name__ == "__main__":
     main()